@@ -1,41 +1,155 @@
+import asyncio
 import csv
+import os
 import re
 import sys
 from datetime import date
 from urllib.parse import urlparse
 
-from playwright.sync_api import sync_playwright
+import httpx
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import async_playwright
 
+try:
+    # 2-5x faster than stdlib json on typical payloads; purely optional.
+    import orjson
+except ImportError:
+    orjson = None
 
-def digits_to_int(s: str):
+# Resource types that never contribute to the stats text; blocking them keeps
+# the fallback page load small and fast.
+_BLOCKED_RESOURCES = "**/*.{png,jpg,jpeg,webp,svg,woff,woff2,mp4,css}"
+
+# Containers holding the per-platform stats widget; pulling just their text
+# keeps the Playwright round-trip and the regex input small. The full body is
+# only serialized when no container matches.
+_STATS_SELECTOR = "[data-testid*='stats'], .stats-panel"
+
+# Maximum number of URLs scraped concurrently.
+CONCURRENCY = 8
+
+# Structured stats endpoint backing the creation detail pages.
+API_CONTENT_URL = "https://api.bethesda.net/ugcmods/v2/content/{creation_id}"
+
+USER_AGENT = "Mozilla/5.0 (compatible; creations-tracking)"
+
+# CSV column order; rows are built as tuples in exactly this order.
+FIELDNAMES = ("date", "creation_id", "slug", "platform", "plays", "likes", "bookmarks", "url")
+
+# Minimum spacing between requests to the same host, so a concurrent batch
+# does not look like a flood to anti-bot filtering.
+DEFAULT_DOMAIN_DELAY_MS = 250
+
+
+class DomainRateLimiter:
+    """
+    Enforces a minimum delay between requests to the same host across all
+    concurrent tasks. Each host gets its own lock and last-request timestamp.
+    """
+
+    def __init__(self, delay_ms: int = DEFAULT_DOMAIN_DELAY_MS):
+        self._delay = delay_ms / 1000.0
+        self._locks = {}
+        self._last_request = {}
+
+    async def wait(self, host: str):
+        lock = self._locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            loop = asyncio.get_running_loop()
+            pause = self._last_request.get(host, 0.0) + self._delay - loop.time()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            self._last_request[host] = loop.time()
+
+_DIGITS_RE = re.compile(r"[^\d]")
+_ID_SLUG_RE = re.compile(r"/details/([0-9a-fA-F-]{36})/([^/]+)")
+
+# Text-fallback patterns, compiled once: the outer per-platform window and the
+# three inner stat labels run many times per page, so avoid the per-call
+# re-module cache probe.
+_PLATFORM_BLOCK_RES = {
+    label: re.compile(rf"{label}\s*(.*?)(?=(Xbox|Computer|PC)\b|$)", re.IGNORECASE | re.DOTALL)
+    for label in ("Computer", "PC", "Xbox")
+}
+_STAT_RE = re.compile(r"(Likes|Bookmarks|Plays)\s*([\d,]+|---)", re.IGNORECASE)
+
+# The stat trio always sits within a short window after the platform label, so
+# the inner scan never needs to look further than this.
+_STAT_WINDOW = 400
+
+# Keys that mark a payload dict as potentially carrying platform stats; dicts
+# disjoint from this set are descended into but never inspected themselves.
+_INTERESTING_KEYS = frozenset(
+    {"platform", "platformName", "hardware", "name", "code", "stats", "likes", "plays", "bookmarks"}
+)
+
+
+def digits_to_int(s):
     if s is None:
         return None
-    n = re.sub(r"[^\d]", "", str(s))
+    # API payloads carry plain ints or clean digit strings; the regex only
+    # needs to run for formatted text like "142,488".
+    if isinstance(s, int) and not isinstance(s, bool):
+        return s
+    if isinstance(s, str):
+        if s.isascii() and s.isdigit():
+            return int(s)
+    else:
+        s = str(s)
+    n = _DIGITS_RE.sub("", s)
     return int(n) if n else None
 
 
 def extract_id_and_slug(url: str):
-    m = re.search(r"/details/([0-9a-fA-F-]{36})/([^/]+)", url)
+    m = _ID_SLUG_RE.search(url)
     return (m.group(1), m.group(2)) if m else (None, None)
 
 
+# Exact-token dispatch for the values the payload actually uses; the
+# substring checks below only run for longer descriptive strings.
+_PLAT_EXACT = {
+    "pc": "PC",
+    "computer": "PC",
+    "windows": "PC",
+    "steam": "PC",
+    "xbox": "Xbox",
+}
+
+
 def normalize_platform(value):
     if value is None:
         return None
     v = str(value).strip().lower()
-    if any(x in v for x in ["computer", "pc", "windows", "steam"]):
+    platform = _PLAT_EXACT.get(v)
+    if platform:
+        return platform
+    if "computer" in v or "pc" in v or "windows" in v or "steam" in v:
         return "PC"
     if "xbox" in v:
         return "Xbox"
     return None
 
 
-def find_first_int(data, keys):
-    if not isinstance(data, dict):
+# Candidate key spellings per stat, with frozenset twins so a single hash
+# intersection can rule a dict out before any per-key lookups run.
+_LIKE_KEYS = ("likes", "likeCount", "totalLikes")
+_LIKE_SET = frozenset(_LIKE_KEYS)
+_BOOKMARK_KEYS = ("bookmarks", "bookmarkCount", "favoriteCount", "favorites")
+_BOOKMARK_SET = frozenset(_BOOKMARK_KEYS)
+_PLAY_KEYS = ("plays", "playCount", "totalPlays", "uses", "downloadCount")
+_PLAY_SET = frozenset(_PLAY_KEYS)
+
+
+def find_first_int(data, keys, key_set):
+    if not isinstance(data, dict) or key_set.isdisjoint(data.keys()):
         return None
     for k in keys:
         if k in data:
-            n = digits_to_int(data.get(k))
+            v = data.get(k)
+            # API payloads usually carry plain ints; skip the regex for them.
+            if isinstance(v, int) and not isinstance(v, bool):
+                return v
+            n = digits_to_int(v)
             if n is not None:
                 return n
     return None
@@ -53,28 +167,27 @@ def extract_rows_from_api_payload(payload, run_date, creation_id, slug, url):
             return
         if likes is None and bookmarks is None and plays is None:
             return
-        rows_by_platform[platform] = {
-            "date": run_date,
-            "creation_id": creation_id,
-            "slug": slug,
-            "platform": platform,
-            "plays": plays,
-            "likes": likes,
-            "bookmarks": bookmarks,
-            "url": url,
-        }
+        # Tuple in FIELDNAMES order, written verbatim by csv.writer.
+        rows_by_platform[platform] = (
+            run_date, creation_id, slug, platform, plays, likes, bookmarks, url,
+        )
 
     def stats_from(d):
         if not isinstance(d, dict):
             return (None, None, None)
-        likes = find_first_int(d, ["likes", "likeCount", "totalLikes"])
-        bookmarks = find_first_int(d, ["bookmarks", "bookmarkCount", "favoriteCount", "favorites"])
-        plays = find_first_int(d, ["plays", "playCount", "totalPlays", "uses", "downloadCount"])
+        likes = find_first_int(d, _LIKE_KEYS, _LIKE_SET)
+        bookmarks = find_first_int(d, _BOOKMARK_KEYS, _BOOKMARK_SET)
+        plays = find_first_int(d, _PLAY_KEYS, _PLAY_SET)
         return (likes, bookmarks, plays)
 
+    def done():
+        return "PC" in rows_by_platform and "Xbox" in rows_by_platform
+
     # Known-ish sections
     if isinstance(payload, dict):
         for key in ["platformStats", "statsByPlatform", "platforms", "stats"]:
+            if done():
+                break
             section = payload.get(key)
             if isinstance(section, list):
                 for item in section:
@@ -90,33 +203,46 @@ def extract_rows_from_api_payload(payload, run_date, creation_id, slug, url):
                     source = item.get("stats") if isinstance(item.get("stats"), dict) else item
                     likes, bookmarks, plays = stats_from(source)
                     put(platform, likes, bookmarks, plays)
+                    if done():
+                        break
             elif isinstance(section, dict):
                 for k, v in section.items():
                     platform = normalize_platform(k)
                     source = v if isinstance(v, dict) else {}
                     likes, bookmarks, plays = stats_from(source)
                     put(platform, likes, bookmarks, plays)
-
-    # Generic recursive scan for platform+stats dictionaries
-    def walk(node):
+                    if done():
+                        break
+
+    # The known sections usually cover both platforms; skip the generic walk
+    # entirely when they did.
+    if done():
+        return [rows_by_platform[p] for p in ["PC", "Xbox"]]
+
+    # Generic iterative scan for platform+stats dictionaries. An explicit
+    # stack avoids Python recursion frames, and the scan stops as soon as
+    # both platforms have rows.
+    stack = [payload]
+    while stack and not done():
+        node = stack.pop()
         if isinstance(node, dict):
-            platform = normalize_platform(
-                node.get("platform")
-                or node.get("platformName")
-                or node.get("hardware")
-                or node.get("name")
-                or node.get("code")
-            )
-            source = node.get("stats") if isinstance(node.get("stats"), dict) else node
-            likes, bookmarks, plays = stats_from(source)
-            put(platform, likes, bookmarks, plays)
-            for v in node.values():
-                walk(v)
+            # Dicts that share no keys with the platform/stat vocabulary
+            # cannot produce a row themselves; just descend into them.
+            if not node.keys().isdisjoint(_INTERESTING_KEYS):
+                platform = normalize_platform(
+                    node.get("platform")
+                    or node.get("platformName")
+                    or node.get("hardware")
+                    or node.get("name")
+                    or node.get("code")
+                )
+                source = node.get("stats") if isinstance(node.get("stats"), dict) else node
+                likes, bookmarks, plays = stats_from(source)
+                put(platform, likes, bookmarks, plays)
+            stack.extend(node.values())
         elif isinstance(node, list):
-            for i in node:
-                walk(i)
+            stack.extend(node)
 
-    walk(payload)
     return [rows_by_platform[p] for p in ["PC", "Xbox"] if p in rows_by_platform]
 
 
@@ -126,23 +252,20 @@ def find_platform_block(text: str, platform_label: str):
     Xbox. Likes. 52. Bookmarks. 683. ... Plays. 142,488
     Computer. Likes. 16. Bookmarks. 159. ... Plays. 75,599
     """
-    m = re.search(rf"{platform_label}\s*(.*?)(?=(Xbox|Computer|PC)\b|$)", text, re.IGNORECASE | re.DOTALL)
+    m = _PLATFORM_BLOCK_RES[platform_label].search(text)
     if not m:
         return None
 
-    block = m.group(1)
-
-    def after(label):
-        mm = re.search(rf"{label}\s*([\d,]+|---)", block, re.IGNORECASE)
-        return mm.group(1) if mm else None
+    block = m.group(1)[:_STAT_WINDOW]
+    vals = {label.lower(): raw for label, raw in _STAT_RE.findall(block)}
 
-    likes_raw = after("Likes")
-    bookmarks_raw = after("Bookmarks")
-    plays_raw = after("Plays")
+    def stat(label):
+        raw = vals.get(label)
+        return None if raw in (None, "---") else digits_to_int(raw)
 
-    likes = None if likes_raw in (None, "---") else digits_to_int(likes_raw)
-    bookmarks = None if bookmarks_raw in (None, "---") else digits_to_int(bookmarks_raw)
-    plays = None if plays_raw in (None, "---") else digits_to_int(plays_raw)
+    likes = stat("likes")
+    bookmarks = stat("bookmarks")
+    plays = stat("plays")
 
     if likes is None and bookmarks is None and plays is None:
         return None
@@ -150,33 +273,86 @@ def find_platform_block(text: str, platform_label: str):
     return {"likes": likes, "bookmarks": bookmarks, "plays": plays}
 
 
-def scrape_one(url: str):
-    parsed = urlparse(url)
-    if parsed.netloc != "creations.bethesda.net":
-        raise ValueError(f"Unexpected domain: {parsed.netloc}")
-
-    creation_id, slug = extract_id_and_slug(url)
-    run_date = date.today().isoformat()
-
-    api_payload = None
-    text = ""
+async def fetch_api_payload(client, limiter, creation_id):
+    """
+    Primary strategy: hit the stats API directly with a plain HTTP client.
+    A full browser is never needed for this path.
+    """
+    if not creation_id:
+        return None
+    endpoint = API_CONTENT_URL.format(creation_id=creation_id)
+    await limiter.wait(urlparse(endpoint).netloc)
+    try:
+        resp = await client.get(endpoint)
+    except httpx.HTTPError:
+        return None
+    if resp.status_code >= 400:
+        return None
+    try:
+        if orjson is not None:
+            return orjson.loads(resp.content)
+        return resp.json()
+    except ValueError:
+        return None
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        context = browser.new_context(ignore_https_errors=True)
-        page = context.new_page()
-        failed_requests = []
 
-        def on_request_failed(req):
-            failed_requests.append((req.resource_type, req.url, req.failure))
+async def fetch_page_text(context, url: str, creation_id):
+    """
+    Secondary strategy: render the page in the shared browser and return its
+    visible text for the legacy block parser, plus the stats API payload if
+    the page happened to fetch it itself. Returns (text, sniffed_payload).
+    """
+    page = await context.new_page()
+    failed_requests = []
+
+    # The SPA fetches the same stats endpoint we tried directly; sniff it off
+    # the wire so a payload blocked for us but not for the browser still gets
+    # the structured treatment. Prefix matching keeps this off the regex
+    # engine entirely.
+    api_prefix = API_CONTENT_URL.format(creation_id=creation_id) if creation_id else None
+    sniffed = []
+
+    async def on_response(resp):
+        if sniffed or api_prefix is None or not resp.url.startswith(api_prefix):
+            return
+        tail = resp.url[len(api_prefix):]
+        if tail and not tail.startswith("?"):
+            return
+        try:
+            sniffed.append(await resp.json())
+        except Exception:
+            pass
 
-        page.on("requestfailed", on_request_failed)
-        page.goto(url, wait_until="networkidle", timeout=60000)
+    def on_request_failed(req):
+        failed_requests.append((req.resource_type, req.url, req.failure))
 
-        # Keep text parsing only as a fallback strategy.
-        text = page.inner_text("body")
-        context.close()
-        browser.close()
+    page.on("response", on_response)
+    page.on("requestfailed", on_request_failed)
+    try:
+        # networkidle waits out analytics/ads polling; the parser only needs
+        # the stats text, so return as soon as it shows up.
+        await page.goto(url, wait_until="domcontentloaded", timeout=20000)
+        try:
+            await page.wait_for_function(
+                "() => /Likes[\\s\\S]{0,400}Plays/.test(document.body.innerText)",
+                timeout=15000,
+            )
+        except PlaywrightTimeoutError:
+            pass
+        text = ""
+        try:
+            panels = page.locator(_STATS_SELECTOR)
+            count = await panels.count()
+            if count:
+                text = "\n".join(
+                    [await panels.nth(i).inner_text(timeout=5000) for i in range(count)]
+                )
+        except PlaywrightTimeoutError:
+            text = ""
+        if not text.strip():
+            text = await page.inner_text("body")
+    finally:
+        await page.close()
 
     if not text.strip():
         blocked = [u for _t, u, _f in failed_requests if "cdn01.bethesda.net" in u]
@@ -193,82 +369,107 @@ def scrape_one(url: str):
                 file=sys.stderr,
             )
 
-    # “Computer” is commonly used on the site; some pages may say “PC”
-    pc = find_platform_block(text, "Computer") or find_platform_block(text, "PC")
-    xbox = find_platform_block(text, "Xbox")
+    return text, (sniffed[0] if sniffed else None)
+
+
+async def scrape_one(get_context, client, limiter, url: str, run_date: str):
+    parsed = urlparse(url)
+    if parsed.netloc != "creations.bethesda.net":
+        raise ValueError(f"Unexpected domain: {parsed.netloc}")
+
+    creation_id, slug = extract_id_and_slug(url)
 
     rows = []
 
     # Primary strategy: structured API payload
+    api_payload = await fetch_api_payload(client, limiter, creation_id)
     if api_payload is not None:
         rows = extract_rows_from_api_payload(api_payload, run_date, creation_id, slug, url)
 
-    # Secondary strategy: legacy text parsing
+    # Secondary strategy: render the page; prefer a payload sniffed off the
+    # page's own API traffic, then fall back to legacy text parsing
     if not rows:
-        pc = find_platform_block(text, "Computer") or find_platform_block(text, "PC")
-        xbox = find_platform_block(text, "Xbox")
-
-        if pc:
-            rows.append({
-                "date": run_date,
-                "creation_id": creation_id,
-                "slug": slug,
-                "platform": "PC",
-                "plays": pc["plays"],
-                "likes": pc["likes"],
-                "bookmarks": pc["bookmarks"],
-                "url": url,
-            })
-
-        if xbox:
-            rows.append({
-                "date": run_date,
-                "creation_id": creation_id,
-                "slug": slug,
-                "platform": "Xbox",
-                "plays": xbox["plays"],
-                "likes": xbox["likes"],
-                "bookmarks": xbox["bookmarks"],
-                "url": url,
-            })
+        context = await get_context()
+        await limiter.wait(parsed.netloc)
+        text, sniffed_payload = await fetch_page_text(context, url, creation_id)
+
+        if sniffed_payload is not None:
+            rows = extract_rows_from_api_payload(sniffed_payload, run_date, creation_id, slug, url)
+
+        if not rows:
+            # “Computer” is commonly used on the site; some pages may say “PC”
+            pc = find_platform_block(text, "Computer") or find_platform_block(text, "PC")
+            xbox = find_platform_block(text, "Xbox")
+
+            if pc:
+                rows.append((
+                    run_date, creation_id, slug, "PC",
+                    pc["plays"], pc["likes"], pc["bookmarks"], url,
+                ))
+
+            if xbox:
+                rows.append((
+                    run_date, creation_id, slug, "Xbox",
+                    xbox["plays"], xbox["likes"], xbox["bookmarks"], url,
+                ))
 
     if not rows:
-        rows.append({
-            "date": run_date,
-            "creation_id": creation_id,
-            "slug": slug,
-            "platform": "Unknown",
-            "plays": None,
-            "likes": None,
-            "bookmarks": None,
-            "url": url,
-        })
+        rows.append((run_date, creation_id, slug, "Unknown", None, None, None, url))
 
-    if not rows:
-        rows.append({
-            "date": run_date,
-            "creation_id": creation_id,
-            "slug": slug,
-            "platform": "Unknown",
-            "plays": None,
-            "likes": None,
-            "bookmarks": None,
-            "url": url
-        })
+    return rows
 
-    if not rows:
-        rows.append({
-            "date": run_date,
-            "creation_id": creation_id,
-            "slug": slug,
-            "platform": "Unknown",
-            "plays": None,
-            "likes": None,
-            "bookmarks": None,
-            "url": url
-        })
 
-    return rows
+async def scrape_all(urls, run_date, write_rows):
+    """
+    Scrape every URL with a shared browser, overlapping the per-URL network
+    latency. Concurrency is capped so we do not hammer the site. Each URL's
+    rows are handed to write_rows as soon as its task finishes, so a crash
+    mid-batch loses only the in-flight URLs. Returns the total row count.
+    """
+    sem = asyncio.Semaphore(CONCURRENCY)
+    limiter = DomainRateLimiter()
+
+    async def bounded(get_context, client, url):
+        async with sem:
+            return await scrape_one(get_context, client, limiter, url, run_date)
+
+    async with async_playwright() as p:
+        browser = None
+        context = None
+        launch_lock = asyncio.Lock()
+
+        async def get_context():
+            # Launch Chromium lazily: batches fully served by the API never
+            # pay browser startup. The lock keeps concurrent fallbacks from
+            # racing to launch twice.
+            nonlocal browser, context
+            async with launch_lock:
+                if context is None:
+                    browser = await p.chromium.launch(headless=True)
+                    context = await browser.new_context(ignore_https_errors=True)
+                    await context.route(_BLOCKED_RESOURCES, lambda route: route.abort())
+                return context
+
+        try:
+            async with httpx.AsyncClient(
+                http2=True,
+                timeout=30.0,
+                headers={"User-Agent": USER_AGENT},
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=50),
+            ) as client:
+                written = 0
+                tasks = [bounded(get_context, client, u) for u in urls]
+                for done in asyncio.as_completed(tasks):
+                    rows = await done
+                    write_rows(rows)
+                    written += len(rows)
+        finally:
+            if context is not None:
+                await context.close()
+            if browser is not None:
+                await browser.close()
+
+    return written
 
 
 def main():
@@ -279,26 +480,50 @@ def main():
     out_csv = sys.argv[1]
     urls = sys.argv[2:]
 
-    fieldnames = ["date", "creation_id", "slug", "platform", "plays", "likes", "bookmarks", "url"]
+    # One date per batch: keeps rows consistent if a run crosses midnight and
+    # saves a time lookup per URL.
+    run_date = date.today().isoformat()
 
-    all_rows = []
-    for u in urls:
-        all_rows.extend(scrape_one(u))
+    exists = os.path.exists(out_csv)
 
-    try:
-        with open(out_csv, "r", newline="", encoding="utf-8"):
-            exists = True
-    except FileNotFoundError:
-        exists = False
+    # The CSV doubles as a cache: re-runs (retries, partial failures) skip
+    # creations already recorded for this date instead of re-fetching them.
+    seen = set()
+    if exists:
+        with open(out_csv, "r", newline="", encoding="utf-8") as f:
+            seen = {(row["creation_id"], row["date"]) for row in csv.DictReader(f)}
+
+    pending = []
+    skipped = 0
+    batch_ids = set()
+    for u in urls:
+        creation_id, _slug = extract_id_and_slug(u)
+        if creation_id and (creation_id, run_date) in seen:
+            skipped += 1
+            continue
+        # Concatenated URL lists often repeat a creation; fetch each one once.
+        if creation_id and creation_id in batch_ids:
+            continue
+        if creation_id:
+            batch_ids.add(creation_id)
+        pending.append(u)
+
+    if skipped:
+        print(f"Skipping {skipped} URLs already recorded for {run_date} in {out_csv}")
 
     with open(out_csv, "a", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=fieldnames)
+        w = csv.writer(f)
         if not exists:
-            w.writeheader()
-        for r in all_rows:
-            w.writerow(r)
+            w.writerow(FIELDNAMES)
+            f.flush()
+
+        def write_rows(rows):
+            w.writerows(rows)
+            f.flush()
+
+        total = asyncio.run(scrape_all(pending, run_date, write_rows))
 
-    print(f"Wrote {len(all_rows)} rows to {out_csv}")
+    print(f"Wrote {total} rows to {out_csv}")
 
 
 if __name__ == "__main__":